@@ -1,11 +1,12 @@
-from flask import Flask, render_template, request, redirect, url_for
+import click
+from flask import Flask, g, render_template, request, redirect, url_for
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import cast, Date
-from collections import defaultdict
+from sqlalchemy import delete, func
+from sqlalchemy.orm import column_property
 import os
-from datetime import datetime, date
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
 from dotenv import load_dotenv
-import pytz # Import the new library
 
 # Load environment variables from .env file for local development
 load_dotenv()
@@ -23,25 +24,54 @@ if DATABASE_URL.startswith("postgres://"):
 
 app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Reuse pooled connections across requests, but check them before use and
+# recycle them periodically so the server or a proxy dropping idle
+# connections doesn't surface as request errors.
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_pre_ping': True,
+    'pool_recycle': 300,
+}
 
 db = SQLAlchemy(app)
 
 # --- Timezone Configuration ---
 # Define the target timezone for Armenia
-YEREVAN_TZ = pytz.timezone('Asia/Yerevan')
+YEREVAN_TZ = ZoneInfo('Asia/Yerevan')
+
+
+def yerevan_time(column):
+    """SQL expression converting a naive UTC timestamp column to naive Yerevan time."""
+    return func.timezone(YEREVAN_TZ.key, func.timezone('UTC', column))
+
+
+# Number of workouts shown per page of the workout history.
+WORKOUTS_PER_PAGE = 50
+# Highest page number accepted from the query string, so a huge ?page= can't
+# turn into an OFFSET Postgres rejects.
+MAX_WORKOUT_PAGE = 100000
 
 
 # --- Database Models ---
 class Workout(db.Model):
+    __table_args__ = (
+        db.Index('ix_workout_timestamp', 'timestamp'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     exercise_name = db.Column(db.String(100), nullable=False)
     reps = db.Column(db.Integer, nullable=False)
     timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Local Armenian time for display, computed by Postgres in the SELECT.
+    local_timestamp = column_property(yerevan_time(timestamp))
 
     def __repr__(self):
         return f'<Workout {self.exercise_name}>'
 
 class Meal(db.Model):
+    __table_args__ = (
+        db.Index('ix_meal_timestamp', 'timestamp'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(150), nullable=False)
     component1 = db.Column(db.String(100))
@@ -51,16 +81,28 @@ class Meal(db.Model):
     component5 = db.Column(db.String(100))
     calories = db.Column(db.Integer)
     timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Local Armenian time for display, computed by Postgres in the SELECT.
+    local_timestamp = column_property(yerevan_time(timestamp))
 
     def __repr__(self):
         return f'<Meal {self.name}>'
 
 
-# Create database tables before any requests.
-with app.app_context():
+# Schema setup is a release step (`flask --app app init-db`, run by the
+# Procfile's release phase), not something every gunicorn worker should
+# repeat on boot. Local `python app.py` runs still create tables themselves.
+@app.cli.command('init-db')
+def init_db():
+    """Creates missing tables and indexes."""
     db.create_all()
-
-# --- Helper Function ---
+    # create_all() skips tables that already exist, including any indexes
+    # added to them later, so create those individually.
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+    click.echo('Database schema is up to date.')
+
+# --- Helper Functions ---
 def format_timedelta(td):
     """Formats a timedelta object into a readable string like '14h 32m'."""
     if td is None:
@@ -73,49 +115,93 @@ def format_timedelta(td):
         return f"{days}d {hours}h {minutes}m"
     return f"{hours}h {minutes}m"
 
+# Largest value a Postgres INTEGER column can hold.
+MAX_DB_INT = 2**31 - 1
+
+def parse_positive_int(value, default=None):
+    """Parses a form value as a positive integer that fits an INTEGER column, or returns default."""
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return default
+    return number if 0 < number <= MAX_DB_INT else default
+
+def yerevan_day_bounds(day):
+    """Returns the naive UTC [start, end) range covering a Yerevan calendar day.
+
+    Timestamps are stored as naive UTC, so comparing the raw column against
+    this range (rather than casting it to a date) lets Postgres use the
+    timestamp index.
+    """
+    start = datetime.combine(day, time.min, tzinfo=YEREVAN_TZ).astimezone(timezone.utc).replace(tzinfo=None)
+    return start, start + timedelta(days=1)
+
+
+@app.before_request
+def set_request_time():
+    """Reads the clock once per request; handlers use g.now_utc and g.today."""
+    g.now_utc = datetime.utcnow()
+    g.today = g.now_utc.replace(tzinfo=timezone.utc).astimezone(YEREVAN_TZ).date()
+
+
+@app.after_request
+def add_cache_headers(response):
+    """Lets browsers revalidate the homepage and get a 304 when it hasn't changed."""
+    if request.endpoint == 'index' and request.method == 'GET' and response.status_code == 200:
+        # no-cache still allows storing, but forces a revalidation so the page
+        # is never stale after a redirect from one of the POST routes.
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response.add_etag()
+        response.make_conditional(request)
+    return response
+
 
 # --- Main Route ---
 @app.route('/')
 def index():
     # --- Workout Data ---
-    all_workouts = Workout.query.order_by(Workout.timestamp.desc()).all()
-    # Convert timestamps to local Armenian time for display
-    for workout in all_workouts:
-        workout.timestamp = workout.timestamp.replace(tzinfo=pytz.utc).astimezone(YEREVAN_TZ)
-
-    today = date.today()
-    todays_workouts = [w for w in all_workouts if w.timestamp.date() == today]
-    
-    workout_summary = defaultdict(int)
-    for workout in todays_workouts:
-        workout_summary[workout.exercise_name] += workout.reps
-    sorted_workout_summary = sorted(workout_summary.items(), key=lambda item: item[0])
-    chart_labels = list(workout_summary.keys())
-    chart_data = list(workout_summary.values())
+    page = min(max(request.args.get('page', 1, type=int), 1), MAX_WORKOUT_PAGE)
+    # The history is read-only, so select plain rows with just the columns
+    # the template shows instead of hydrating tracked ORM objects.
+    pagination = Workout.query.with_entities(
+        Workout.id,
+        Workout.exercise_name,
+        Workout.reps,
+        Workout.local_timestamp.label('local_timestamp'),
+    ).order_by(Workout.timestamp.desc()).paginate(
+        page=page, per_page=WORKOUTS_PER_PAGE, error_out=False
+    )
+    all_workouts = pagination.items
+
+    day_start, day_end = yerevan_day_bounds(g.today)
+    sorted_workout_summary = db.session.query(
+        Workout.exercise_name, func.sum(Workout.reps).label('total')
+    ).filter(
+        Workout.timestamp >= day_start, Workout.timestamp < day_end
+    ).group_by(Workout.exercise_name).order_by(Workout.exercise_name).all()
+    if sorted_workout_summary:
+        chart_labels, chart_data = map(list, zip(*sorted_workout_summary))
+    else:
+        chart_labels, chart_data = [], []
 
     # --- Meal Data ---
-    meals_asc = Meal.query.order_by(Meal.timestamp.asc()).all()
-    # Convert meal timestamps to local Armenian time *before* calculating differences
-    for meal in meals_asc:
-        meal.timestamp = meal.timestamp.replace(tzinfo=pytz.utc).astimezone(YEREVAN_TZ)
-
-    meals_with_fasting_time = []
-    for i, meal in enumerate(meals_asc):
-        fasted_time = None
-        if i > 0:
-            time_diff = meal.timestamp - meals_asc[i-1].timestamp
-            fasted_time = format_timedelta(time_diff)
-        
-        meals_with_fasting_time.append({
+    # Time since the previous meal comes from a LAG window over ascending
+    # timestamps; the outer ORDER BY then returns newest first.
+    fasted = Meal.timestamp - func.lag(Meal.timestamp).over(order_by=Meal.timestamp)
+    meal_rows = db.session.query(Meal, fasted.label('fasted')).order_by(Meal.timestamp.desc()).all()
+    meals_with_fasting_time = [
+        {
             'meal': meal,
-            'fasted_time': fasted_time
-        })
-    
-    meals_with_fasting_time.reverse()
+            'fasted_time': format_timedelta(fasted_td) if fasted_td is not None else None
+        }
+        for meal, fasted_td in meal_rows
+    ]
 
     return render_template(
         'index.html',
         workouts=all_workouts,
+        pagination=pagination,
         sorted_summary=sorted_workout_summary,
         chart_labels=chart_labels,
         chart_data=chart_data,
@@ -127,9 +213,9 @@ def index():
 @app.route('/add_workout', methods=['POST'])
 def add_workout():
     exercise_name = request.form.get('exercise_name')
-    reps_str = request.form.get('reps')
-    if exercise_name and reps_str and reps_str.isdigit():
-        new_workout = Workout(exercise_name=exercise_name, reps=int(reps_str))
+    reps = parse_positive_int(request.form.get('reps'))
+    if exercise_name and reps:
+        new_workout = Workout(exercise_name=exercise_name, reps=reps, timestamp=g.now_utc)
         db.session.add(new_workout)
         db.session.commit()
     return redirect(url_for('index'))
@@ -146,18 +232,14 @@ def update_workout(workout_id):
     workout = db.session.get(Workout, workout_id)
     if workout:
         workout.exercise_name = request.form.get('exercise_name')
-        reps_str = request.form.get('reps')
-        if reps_str and reps_str.isdigit():
-            workout.reps = int(reps_str)
+        workout.reps = parse_positive_int(request.form.get('reps'), default=workout.reps)
         db.session.commit()
     return redirect(url_for('index'))
 
 @app.route('/delete_workout/<int:workout_id>')
 def delete_workout(workout_id):
-    workout = db.session.get(Workout, workout_id)
-    if workout:
-        db.session.delete(workout)
-        db.session.commit()
+    db.session.execute(delete(Workout).where(Workout.id == workout_id))
+    db.session.commit()
     return redirect(url_for('index'))
 
 
@@ -174,7 +256,8 @@ def add_meal():
             component3=request.form.get('component3'),
             component4=request.form.get('component4'),
             component5=request.form.get('component5'),
-            calories=int(calories) if calories and calories.isdigit() else None
+            calories=parse_positive_int(calories),
+            timestamp=g.now_utc
         )
         db.session.add(new_meal)
         db.session.commit()
@@ -197,20 +280,20 @@ def update_meal(meal_id):
         meal.component3=request.form.get('component3')
         meal.component4=request.form.get('component4')
         meal.component5=request.form.get('component5')
-        calories = request.form.get('calories')
-        meal.calories=int(calories) if calories and calories.isdigit() else None
+        meal.calories=parse_positive_int(request.form.get('calories'))
         db.session.commit()
     return redirect(url_for('index'))
 
 @app.route('/delete_meal/<int:meal_id>')
 def delete_meal(meal_id):
-    meal = db.session.get(Meal, meal_id)
-    if meal:
-        db.session.delete(meal)
-        db.session.commit()
+    db.session.execute(delete(Meal).where(Meal.id == meal_id))
+    db.session.commit()
     return redirect(url_for('index'))
 
 # --- Main Entry Point (for local development only) ---
 if __name__ == '__main__':
+    # Deployments create the schema in their release step (see Procfile).
+    with app.app_context():
+        db.create_all()
     app.run(debug=True)
 
@@ -0,0 +1,21 @@
+# Gunicorn configuration, picked up automatically by `gunicorn app:app`
+# when started from the project directory.
+import multiprocessing
+import os
+
+# --- Binding ---
+# Use the platform's PORT when set; GUNICORN_BIND overrides it, e.g. with
+# "unix:/tmp/fitness.sock" when running behind nginx on the same host.
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+
+# --- Workers ---
+# Each worker holds its own SQLAlchemy connection pool, so keep
+# WEB_CONCURRENCY in line with the database's connection limit.
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Threads let a worker keep serving while other requests wait on Postgres,
+# without the monkey-patching psycopg2 would need under gevent.
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# --- Connections ---
+keepalive = 30